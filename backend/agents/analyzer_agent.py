@@ -2,10 +2,48 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from groq import Groq
+from groq import AsyncGroq
+import hashlib
 import os
-from typing import Dict, List, Optional
-import json
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+import orjson
+from cachetools import LRUCache, TTLCache
+
+from . import analyzer_rules
+from .groq_utils import GroqBatcher, completion_with_backoff
+
+# In-process cache for LLM analyses - repeat (symbol, metrics) lookups
+# (dashboard refreshes, repeat chat queries) shouldn't hit Groq twice
+_llm_cache: TTLCache = TTLCache(maxsize=512, ttl=3600)
+_llm_cache_dir = "data/cache/llm"
+
+# Model routing: short templated tasks go to the instant 8B model
+# (~2x faster TTFT and throughput), 70B is reserved for deep reasoning
+SPEED_TIERS = {
+    "instant": "llama-3.1-8b-instant",
+    "balanced": "llama-3.3-70b-versatile",
+}
+
+# Static part of the chat system prompt - built once at import, the
+# knowledge base is the only piece that changes between calls.
+# Deliberately minified: every header, asterisk and indent costs input
+# tokens on each call and TTFT scales linearly with them.
+_CHAT_RULES = (
+    "You are 'Khabri', an AI financial assistant. Rules: "
+    "1) Specific company numbers (revenue, profit, etc.) come only from the KNOWLEDGE BASE JSON - never invent metrics, quote them exactly. "
+    "2) Maintain context from the chat history; follow naturally from the last user query. "
+    "3) No investment advice - never suggest buying, selling, or holding. "
+    "4) Only answer finance/stocks/business questions. "
+    "If the company is in the KNOWLEDGE BASE, answer strictly from its JSON. "
+    "If it's a real company not in the KNOWLEDGE BASE, give a brief factual summary starting with 'Based on general public information...'. "
+    "If the name isn't a real company or stock, say you can only provide information on real companies. "
+    "If off-topic, reply: 'I am a financial assistant and can only answer questions related to stocks and companies.'\n"
+    "KNOWLEDGE BASE:\n"
+)
+
+_CHAT_RULES_TAIL = "\nContinue the conversation; the last message is the user's most recent question."
 
 class AnalyzerAgent:
     """
@@ -18,10 +56,58 @@ class AnalyzerAgent:
         if not api_key:
             print("⚠️ GROQ_API_KEY not set. Using rule-based analysis.")
             self.client = None
+            self._http_client = None
+            self._batcher = None
         else:
-            self.client = Groq(api_key=api_key)
-        
-        self.model = "llama-3.3-70b-versatile"  # NEW - Fast & reliable
+            # Persistent keep-alive pool - default per-call connections pay
+            # a fresh TCP/TLS handshake that dwarfs short Groq completions
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=60),
+                timeout=30
+            )
+            self.client = AsyncGroq(api_key=api_key, http_client=self._http_client)
+
+        self.model = SPEED_TIERS["instant"]  # analyzer prompt is short & templated
+        self.chat_model = SPEED_TIERS["balanced"]  # chat needs the reasoning headroom
+
+        # Coalesce analysis prompts that land within a short window (e.g.
+        # bulk_analyze bursts) into one completion instead of N
+        if self.client:
+            self._batcher = GroqBatcher(
+                self.client,
+                self.model,
+                system="You are a street-smart stock analyst. Be concise, relatable, and honest. Respond in JSON.",
+                max_tokens=256,  # starts tight; the batcher auto-raises on truncated replies
+                temperature=0.7
+            )
+
+        # Chat responses start tight and auto-raise if Groq reports a
+        # truncation - output tokens are the dominant latency at ~280 tok/s
+        self._chat_max_tokens = 180
+
+        # Composed chat system prompts keyed by knowledge-base hash - the KB
+        # only changes when a new analysis lands, so reuse the built string
+        self._prompt_cache: LRUCache = LRUCache(maxsize=16)
+
+    def _chat_system_prompt(self, knowledge_base: str) -> str:
+        """Compose (or reuse) the full chat system prompt for this knowledge base"""
+        kb_hash = hashlib.blake2b(knowledge_base.encode(), digest_size=8).digest()
+        prompt = self._prompt_cache.get(kb_hash)
+        if prompt is None:
+            prompt = f"{_CHAT_RULES}{knowledge_base}{_CHAT_RULES_TAIL}"
+            self._prompt_cache[kb_hash] = prompt
+        return prompt
+
+    def _note_chat_finish(self, finish_reason: Optional[str]):
+        """Raise the chat token budget 50% (capped) if the last reply was truncated"""
+        if finish_reason == "length":
+            self._chat_max_tokens = min(600, int(self._chat_max_tokens * 1.5))
+            print(f"📏 Chat reply truncated - raising max_tokens to {self._chat_max_tokens}")
+
+    async def close(self):
+        """Release the shared HTTP connection pool (call on app shutdown)"""
+        if self._http_client:
+            await self._http_client.aclose()
     
     async def analyze_financials(self, parsed_data: Dict, symbol: str) -> Dict:
         """
@@ -34,10 +120,51 @@ class AnalyzerAgent:
             # Fallback to rule-based analysis
             return self._analyze_with_rules(parsed_data, symbol)
     
+    def _analysis_cache_key(self, data: Dict, symbol: str) -> str:
+        """
+        Build a stable cache key from the parsed metrics (rounded so float noise doesn't miss)
+        """
+        canonical = {k: round(v, 4) if isinstance(v, float) else v for k, v in data.items()}
+        canonical["sym"] = symbol
+        payload = orjson.dumps(canonical, option=orjson.OPT_SORT_KEYS, default=str)
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def _load_cached_analysis(self, key: str) -> Optional[Dict]:
+        """Check memory first, then the disk cache (survives restarts)"""
+        if key in _llm_cache:
+            return _llm_cache[key]
+
+        filepath = os.path.join(_llm_cache_dir, f"{key}.json")
+        if os.path.exists(filepath):
+            try:
+                with open(filepath, 'rb') as f:
+                    analysis = orjson.loads(f.read())
+                _llm_cache[key] = analysis
+                return analysis
+            except Exception:
+                pass
+        return None
+
+    def _store_cached_analysis(self, key: str, analysis: Dict):
+        """Store in memory + disk so restarts keep hits"""
+        _llm_cache[key] = analysis
+        try:
+            os.makedirs(_llm_cache_dir, exist_ok=True)
+            with open(os.path.join(_llm_cache_dir, f"{key}.json"), 'wb') as f:
+                f.write(orjson.dumps(analysis))
+        except Exception as e:
+            print(f"⚠️ Could not persist analysis cache: {e}")
+
     async def _analyze_with_llm(self, data: Dict, symbol: str) -> Dict:
         """
-        Generate insights using Groq LLM
+        Generate insights using Groq LLM (cached - repeat lookups skip the network)
         """
+        cache_key = self._analysis_cache_key(data, symbol)
+        cached = self._load_cached_analysis(cache_key)
+        if cached is not None:
+            print(f"⚡ Cache hit for {symbol} analysis")
+            return cached
+
         try:
             prompt = f"""You are a stock market analyst. Analyze these quarterly results and provide insights in a casual, engaging tone (like explaining to a friend):
 
@@ -57,32 +184,17 @@ Provide:
 2. 3-4 key highlights (positive points)
 3. 2-3 red flags or concerns (if any)
 
-Format as JSON:
+Use this JSON schema:
 {{
   "insights": "summary text",
   "highlights": ["point 1", "point 2", ...],
   "red_flags": ["concern 1", "concern 2", ...]
 }}"""
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a street-smart stock analyst. Be concise, relatable, and honest."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=800
-            )
-            
-            result = response.choices[0].message.content.strip()
-            
-            # Extract JSON from response
-            if "```json" in result:
-                result = result.split("```json")[1].split("```")[0].strip()
-            elif "```" in result:
-                result = result.split("```")[1].split("```")[0].strip()
-            
-            analysis = json.loads(result)
+            # The batcher coalesces concurrent analysis prompts into one
+            # completion and handles JSON mode + the decode retry
+            analysis = await self._batcher.ask(prompt)
+            self._store_cached_analysis(cache_key, analysis)
             print(f"✅ LLM generated insights for {symbol}")
             return analysis
             
@@ -111,124 +223,85 @@ Format as JSON:
             "red_flags": red_flags
         }
     
+    def analyze_many_rule_based(self, symbols: List[str], metrics: Dict[str, List[float]]) -> List[Dict]:
+        """
+        Columnar batch variant of _analyze_with_rules for historical
+        backfills - see analyzer_rules.analyze_many.
+        """
+        return analyzer_rules.analyze_many(symbols, metrics)
+
     def _generate_insights_text(self, symbol: str, revenue: float, yoy: float, margin: float) -> str:
         """
         Generate main insights text
         """
-        if yoy > 15:
-            performance = "absolutely crushing it"
-        elif yoy > 8:
-            performance = "performing solidly"
-        elif yoy > 3:
-            performance = "showing steady growth"
-        elif yoy > 0:
-            performance = "growing but at a slower pace"
-        else:
-            performance = "facing headwinds"
-        
-        return f"{symbol} is {performance} this quarter with ₹{revenue:,.0f} Cr in revenue ({yoy:+.1f}% YoY). Operating margins at {margin:.1f}% show {'strong' if margin > 18 else 'decent' if margin > 12 else 'tight'} operational efficiency. {'Bulls are happy! 🚀' if yoy > 10 else 'Not bad, but room for improvement.' if yoy > 3 else 'Bears might be lurking. 🐻'}"
-    
+        return analyzer_rules.generate_insights_text(symbol, revenue, yoy, margin)
+
     def _generate_highlights(self, yoy: float, margin: float, eps: float, revenue: float) -> List[str]:
         """
         Generate positive highlights
         """
-        highlights = []
-        
-        if yoy > 10:
-            highlights.append(f"Strong double-digit YoY growth of {yoy:.1f}% - momentum is real!")
-        elif yoy > 5:
-            highlights.append(f"Healthy growth trajectory with {yoy:.1f}% YoY increase")
-        elif yoy > 0:
-            highlights.append(f"Maintaining positive growth at {yoy:.1f}% YoY despite market conditions")
-        
-        if margin > 20:
-            highlights.append(f"Excellent operating margins at {margin:.1f}% - pricing power on display")
-        elif margin > 15:
-            highlights.append(f"Solid margins of {margin:.1f}% showing operational discipline")
-        
-        if eps > 25:
-            highlights.append(f"Impressive EPS of ₹{eps:.2f} - shareholders eating good!")
-        elif eps > 15:
-            highlights.append(f"Decent EPS of ₹{eps:.2f} maintaining shareholder value")
-        
-        if revenue > 50000:
-            highlights.append("Massive scale with revenue crossing ₹50,000 Cr - market leader vibes")
-        elif revenue > 20000:
-            highlights.append("Strong revenue base showing market presence")
-        
-        # Ensure at least 2 highlights
-        if len(highlights) < 2:
-            highlights.append("Company delivering on expectations this quarter")
-        
-        return highlights[:4]  # Max 4 highlights
-    
+        return analyzer_rules.generate_highlights(yoy, margin, eps, revenue)
+
     def _generate_red_flags(self, yoy: float, margin: float, pat: float) -> List[str]:
         """
         Generate concerns/red flags
         """
-        red_flags = []
-        
-        if yoy < 0:
-            red_flags.append(f"Negative YoY growth of {yoy:.1f}% - revenues declining, not good fam")
-        elif yoy < 3:
-            red_flags.append(f"Sluggish growth at {yoy:.1f}% - needs to pick up pace")
-        
-        if margin < 10:
-            red_flags.append(f"Low margins at {margin:.1f}% - profitability under pressure")
-        elif margin < 15:
-            red_flags.append(f"Margins at {margin:.1f}% could be better - watch operational costs")
-        
-        if pat < 1000:
-            red_flags.append("Profit levels are concerning - needs stronger bottom line")
-        
-        # If no red flags, add a neutral observation
-        if len(red_flags) == 0:
-            red_flags.append("Nothing major to worry about, but keep an eye on market trends")
-        
-        return red_flags[:3]  # Max 3 red flags
+        return analyzer_rules.generate_red_flags(yoy, margin, pat)
     
     async def answer_with_memory(self, messages: List[Dict], knowledge_base: str) -> str:
         """
         Answers a user's question using a single, comprehensive prompt with rules,
         conversation history, and a knowledge base.
+
+        Raises on failure instead of returning an error string, so callers
+        can tell a real answer from a failure (and never cache the latter).
         """
         if not self.client:
-            return "Chat feature requires Groq API key. Please set GROQ_API_KEY environment variable."
+            raise RuntimeError("Chat feature requires Groq API key. Please set GROQ_API_KEY environment variable.")
 
         # This is the system prompt that controls all AI behavior
-        system_prompt = f"""
-        You are 'Khabri', an AI financial assistant. Your purpose is to be helpful, accurate, and safe.
-
-        **STRICT BEHAVIORAL RULES:**
-        1.  **SINGLE SOURCE OF TRUTH:** Your only source for specific company performance data (revenue, profit, etc.) is the JSON provided in the 'KNOWLEDGE BASE'. You MUST **NEVER** invent numbers or metrics. Quote the numbers exactly as they are.
-        2.  **CONVERSATION MEMORY:** Maintain context using the 'CHAT HISTORY'. Your response should follow naturally from the last user query.
-        3.  **NO FINANCIAL ADVICE:** You MUST NOT give any investment advice. Do not suggest buying, selling, or holding.
-        4.  **STAY ON TOPIC:** You are a financial assistant. Politely decline any requests unrelated to finance, stocks, or business.
+        # (static rules + KB, composed once per knowledge base)
+        system_prompt = self._chat_system_prompt(knowledge_base)
 
-        **QUERY HANDLING LOGIC:**
-        -   **IF** the user asks about a company found in the 'KNOWLEDGE BASE', base your answer strictly on the JSON data provided for that company.
-        -   **IF** the user asks about a real company that is NOT in the 'KNOWLEDGE BASE', provide a brief, factual summary from your general knowledge. Start your response with "Based on general public information...".
-        -   **IF** the user's query seems to refer to a name that is not a real company or stock (e.g., a person's name), politely state that you can only provide information on real companies.
-        -   **IF** the query is off-topic, state your purpose: "I am a financial assistant and can only answer questions related to stocks and companies."
+        # Prepend the system prompt to the message history for the API call
+        api_messages = [{"role": "system", "content": system_prompt}] + messages
 
-        **KNOWLEDGE BASE (Your specific data):**
-        ```json
-        {knowledge_base}
-        ```
+        response = await completion_with_backoff(
+            self.client.chat.completions.create,
+            model=self.chat_model, # A powerful model is needed to follow complex instructions
+            messages=api_messages,
+            temperature=0.2, # Lower temperature to reduce hallucination and be more factual
+            max_tokens=self._chat_max_tokens
+        )
+        self._note_chat_finish(response.choices[0].finish_reason)
+        return response.choices[0].message.content.strip()
 
-        Now, continue the conversation based on the CHAT HISTORY. The last message is the user's most recent question.
+    async def answer_with_memory_stream(self, messages: List[Dict], knowledge_base: str) -> AsyncIterator[str]:
         """
+        Streaming variant of answer_with_memory - yields tokens as Groq
+        produces them so the frontend can render at TTFT instead of waiting
+        ~1s for the full completion.
+        """
+        if not self.client:
+            yield "Chat feature requires Groq API key. Please set GROQ_API_KEY environment variable."
+            return
 
-        # Prepend the system prompt to the message history for the API call
+        system_prompt = self._chat_system_prompt(knowledge_base)
         api_messages = [{"role": "system", "content": system_prompt}] + messages
 
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile", # A powerful model is needed to follow complex instructions
+            stream = await completion_with_backoff(
+                self.client.chat.completions.create,
+                model=self.chat_model,
                 messages=api_messages,
-                temperature=0.2, # Lower temperature to reduce hallucination and be more factual
-                max_tokens=300
+                temperature=0.2,
+                max_tokens=self._chat_max_tokens,
+                stream=True
             )
-            return response.choices[0].message.content.strip()
+            finish_reason = None
+            async for chunk in stream:
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                yield chunk.choices[0].delta.content or ""
+            self._note_chat_finish(finish_reason)
         except Exception as e:
-            return f"Couldn't process that question right now. Try again! Error: {str(e)}"
\ No newline at end of file
+            yield f"Couldn't process that question right now. Try again! Error: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,114 @@
+# Rule-based analysis kernel, kept free of class/self overhead so bulk
+# historical reprocessing can call straight into module functions.
+
+from bisect import bisect_left, bisect_right
+from typing import Dict, List
+
+# Thresholds are ascending; _band() returns how many a value strictly
+# clears, indexing straight into the matching template
+_PERF_BANDS = (0, 3, 8, 15)
+_PERF_LABELS = ("facing headwinds", "growing but at a slower pace",
+                "showing steady growth", "performing solidly", "absolutely crushing it")
+_MARGIN_QUALITY_BANDS = (12, 18)
+_MARGIN_QUALITY_LABELS = ("tight", "decent", "strong")
+_CLOSER_BANDS = (3, 10)
+_CLOSER_LABELS = ("Bears might be lurking. 🐻", "Not bad, but room for improvement.", "Bulls are happy! 🚀")
+
+# (thresholds, templates) per metric; None means "no highlight at this band"
+_HIGHLIGHT_RULES = (
+    ((0, 5, 10), (None,
+                  "Maintaining positive growth at {v:.1f}% YoY despite market conditions",
+                  "Healthy growth trajectory with {v:.1f}% YoY increase",
+                  "Strong double-digit YoY growth of {v:.1f}% - momentum is real!")),
+    ((15, 20), (None,
+                "Solid margins of {v:.1f}% showing operational discipline",
+                "Excellent operating margins at {v:.1f}% - pricing power on display")),
+    ((15, 25), (None,
+                "Decent EPS of ₹{v:.2f} maintaining shareholder value",
+                "Impressive EPS of ₹{v:.2f} - shareholders eating good!")),
+    ((20000, 50000), (None,
+                      "Strong revenue base showing market presence",
+                      "Massive scale with revenue crossing ₹50,000 Cr - market leader vibes")),
+)
+
+_RED_FLAG_RULES = (
+    ((0, 3), ("Negative YoY growth of {v:.1f}% - revenues declining, not good fam",
+              "Sluggish growth at {v:.1f}% - needs to pick up pace",
+              None)),
+    ((10, 15), ("Low margins at {v:.1f}% - profitability under pressure",
+                "Margins at {v:.1f}% could be better - watch operational costs",
+                None)),
+    ((1000,), ("Profit levels are concerning - needs stronger bottom line",
+               None)),
+)
+
+
+def _band(value: float, thresholds) -> int:
+    """How many (ascending) thresholds the value strictly clears"""
+    return bisect_left(thresholds, value)
+
+
+def generate_insights_text(symbol: str, revenue: float, yoy: float, margin: float) -> str:
+    """Main insights sentence for one company"""
+    performance = _PERF_LABELS[_band(yoy, _PERF_BANDS)]
+    efficiency = _MARGIN_QUALITY_LABELS[_band(margin, _MARGIN_QUALITY_BANDS)]
+    closer = _CLOSER_LABELS[_band(yoy, _CLOSER_BANDS)]
+
+    return f"{symbol} is {performance} this quarter with ₹{revenue:,.0f} Cr in revenue ({yoy:+.1f}% YoY). Operating margins at {margin:.1f}% show {efficiency} operational efficiency. {closer}"
+
+
+def generate_highlights(yoy: float, margin: float, eps: float, revenue: float) -> List[str]:
+    """Positive highlights (at least 2, max 4)"""
+    highlights = []
+    append = highlights.append  # hoisted - this runs in tight backfill loops
+
+    for value, (bands, templates) in zip((yoy, margin, eps, revenue), _HIGHLIGHT_RULES):
+        template = templates[bisect_left(bands, value)]
+        if template:
+            append(template.format(v=value))
+
+    if len(highlights) < 2:
+        append("Company delivering on expectations this quarter")
+
+    return highlights[:4]
+
+
+def generate_red_flags(yoy: float, margin: float, pat: float) -> List[str]:
+    """Concerns/red flags (at least 1, max 3)"""
+    red_flags = []
+    append = red_flags.append
+
+    for value, (bands, templates) in zip((yoy, margin, pat), _RED_FLAG_RULES):
+        # Red flags trigger on "value < threshold", so equal values
+        # belong to the band above (bisect_right, not bisect_left)
+        template = templates[bisect_right(bands, value)]
+        if template:
+            append(template.format(v=value))
+
+    if len(red_flags) == 0:
+        append("Nothing major to worry about, but keep an eye on market trends")
+
+    return red_flags[:3]
+
+
+def analyze_many(symbols: List[str], metrics: Dict[str, List[float]]) -> List[Dict]:
+    """
+    Columnar batch analysis: one list per metric, aligned with symbols.
+    The hot loop zips plain lists instead of doing per-row dict lookups.
+    """
+    n = len(symbols)
+    revenue_col = metrics.get("revenue") or [0] * n
+    pat_col = metrics.get("profit_after_tax") or [0] * n
+    yoy_col = metrics.get("yoy_growth") or [0] * n
+    margin_col = metrics.get("operating_margin") or [0] * n
+    eps_col = metrics.get("eps") or [0] * n
+
+    return [
+        {
+            "insights": generate_insights_text(symbol, revenue, yoy, margin),
+            "highlights": generate_highlights(yoy, margin, eps, revenue),
+            "red_flags": generate_red_flags(yoy, margin, pat),
+        }
+        for symbol, revenue, pat, yoy, margin, eps
+        in zip(symbols, revenue_col, pat_col, yoy_col, margin_col, eps_col)
+    ]
@@ -1,21 +1,38 @@
-import requests
+import httpx
+import aiofiles
+import hashlib
 import os
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from bs4 import BeautifulSoup
-import time
+import re
+
+# Compiled once - matched against anchor text when scanning IR pages
+_KEYWORD_RE = re.compile(r'result|quarter|financial|Q[1-4]', re.IGNORECASE)
 
 class PDFFetcherAgent:
     """
     Fetches quarterly result PDFs from company websites/exchanges
     """
-    
+
     def __init__(self):
         self.download_dir = "data/pdfs"
         os.makedirs(self.download_dir, exist_ok=True)
-        
+
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
+
+        # One shared async session - keep-alive avoids a TLS handshake per
+        # request and the async calls stop blocking the event loop
+        self._session = httpx.AsyncClient(
+            headers=self.headers,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=20, keepalive_expiry=60)
+        )
+
+        # url -> (etag, filepath): lets repeat fetches skip the multi-MB
+        # body transfer (and the re-parse downstream) when nothing changed
+        self._url_cache: Dict[str, Tuple[Optional[str], str]] = {}
         
         # Company website patterns (for major companies)
         self.company_ir_urls = {
@@ -26,27 +43,31 @@ class PDFFetcherAgent:
             # Add more as needed
         }
     
-    async def fetch_result_pdf(self, symbol: str) -> Optional[str]:
+    async def fetch_result_pdf(self, symbol: str) -> Tuple[Optional[str], Optional[bytes]]:
         """
-        Fetch the latest quarterly result PDF for a company
+        Fetch the latest quarterly result PDF for a company.
+
+        Returns (path, pdf_bytes). Bytes are populated on a fresh download
+        so the parser can open them in-memory without re-reading the file
+        we just wrote; they're None for cache hits and the demo marker.
         """
         print(f"🔍 Searching for {symbol} results PDF...")
-        
+
         # Strategy 1: Try company IR website
-        pdf_path = await self._fetch_from_company_site(symbol)
-        if pdf_path:
-            return pdf_path
-        
+        fetched = await self._fetch_from_company_site(symbol)
+        if fetched:
+            return fetched
+
         # Strategy 2: Try BSE/NSE announcements
-        pdf_path = await self._fetch_from_exchange(symbol)
-        if pdf_path:
-            return pdf_path
-        
+        fetched = await self._fetch_from_exchange(symbol)
+        if fetched:
+            return fetched
+
         # Strategy 3: Generate mock PDF for demo (with real-looking data)
         print(f"⚠️ Could not find real PDF, using demo data for {symbol}")
-        return await self._create_demo_pdf(symbol)
+        return await self._create_demo_pdf(symbol), None
     
-    async def _fetch_from_company_site(self, symbol: str) -> Optional[str]:
+    async def _fetch_from_company_site(self, symbol: str) -> Optional[Tuple[str, Optional[bytes]]]:
         """
         Try to fetch from company's investor relations page
         """
@@ -55,22 +76,20 @@ class PDFFetcherAgent:
         
         try:
             url = self.company_ir_urls[symbol]
-            response = requests.get(url, headers=self.headers, timeout=10)
-            
+            response = await self._session.get(url, timeout=10)
+
             if response.status_code != 200:
                 return None
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for PDF links containing keywords
-            keywords = ['result', 'quarterly', 'financial', 'Q4', 'Q3', 'Q2', 'Q1']
-            pdf_links = soup.find_all('a', href=True)
-            
+            # lxml parses large IR pages several times faster than html.parser,
+            # and the selector filters PDF hrefs in C instead of Python
+            soup = BeautifulSoup(response.content, 'lxml')
+            pdf_links = soup.select('a[href$=".pdf"], a[href*=".pdf?"]')
+
             for link in pdf_links:
                 href = link['href']
-                text = link.get_text().lower()
-                
-                if '.pdf' in href and any(kw in text for kw in keywords):
+
+                if _KEYWORD_RE.search(link.get_text()):
                     pdf_url = href if href.startswith('http') else url + href
                     return await self._download_pdf(pdf_url, symbol)
             
@@ -80,7 +99,7 @@ class PDFFetcherAgent:
             print(f"❌ Error fetching from company site: {e}")
             return None
     
-    async def _fetch_from_exchange(self, symbol: str) -> Optional[str]:
+    async def _fetch_from_exchange(self, symbol: str) -> Optional[Tuple[str, Optional[bytes]]]:
         """
         Try to fetch from BSE/NSE announcements
         """
@@ -93,31 +112,61 @@ class PDFFetcherAgent:
         except:
             return None
     
-    async def _download_pdf(self, url: str, symbol: str) -> Optional[str]:
+    async def _download_pdf(self, url: str, symbol: str) -> Optional[Tuple[str, Optional[bytes]]]:
         """
-        Download PDF from URL
+        Download PDF from URL, returning (path, bytes) so callers can hand
+        the in-memory copy straight to the parser
         """
         try:
+            # Cheap freshness check first - if the ETag matches what we
+            # already have on disk, skip the body transfer entirely
+            etag = None
+            if url in self._url_cache:
+                try:
+                    head = await self._session.head(url, timeout=10)
+                    etag = head.headers.get("etag")
+                except Exception:
+                    pass
+
+                cached_etag, cached_path = self._url_cache[url]
+                if etag and etag == cached_etag and os.path.exists(cached_path):
+                    print(f"⚡ PDF unchanged (ETag match), reusing {cached_path}")
+                    return cached_path, None
+
             print(f"📥 Downloading PDF from {url}")
-            response = requests.get(url, headers=self.headers, timeout=30, stream=True)
-            
-            if response.status_code == 200:
-                filename = f"{symbol}_{int(time.time())}.pdf"
-                filepath = os.path.join(self.download_dir, filename)
-                
-                with open(filepath, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                
+            async with self._session.stream("GET", url, timeout=30) as response:
+                if response.status_code != 200:
+                    return None
+
+                chunks = []
+                async for chunk in response.aiter_bytes(chunk_size=65536):
+                    chunks.append(chunk)
+                etag = response.headers.get("etag")
+
+            pdf_bytes = b"".join(chunks)
+
+            # Content-hash filename dedupes identical PDFs across fetches
+            digest = hashlib.blake2b(pdf_bytes, digest_size=8).hexdigest()
+            filepath = os.path.join(self.download_dir, f"{symbol}_{digest}.pdf")
+
+            if not os.path.exists(filepath):
+                async with aiofiles.open(filepath, 'wb') as f:
+                    await f.write(pdf_bytes)
                 print(f"✅ Downloaded: {filepath}")
-                return filepath
-            
-            return None
-            
+            else:
+                print(f"⚡ Identical PDF already on disk: {filepath}")
+
+            self._url_cache[url] = (etag, filepath)
+            return filepath, pdf_bytes
+
         except Exception as e:
             print(f"❌ Download failed: {e}")
             return None
     
+    async def close(self):
+        """Release the shared HTTP session (call on app shutdown)"""
+        await self._session.aclose()
+
     async def _create_demo_pdf(self, symbol: str) -> Optional[str]:
         """
         For hackathon demo: Create a mock PDF path that the parser can handle
@@ -0,0 +1,194 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+
+def _is_rate_limit(exc: Exception) -> bool:
+    """Groq free-tier throttling surfaces as 429 / rate limit / quota errors"""
+    msg = str(exc).lower()
+    return "429" in msg or "rate limit" in msg or "quota" in msg
+
+
+async def completion_with_backoff(create, attempts: int = 3, **kwargs):
+    """
+    Call chat.completions.create with exponential backoff on rate limits.
+    Other errors propagate immediately - only throttling is worth waiting out.
+    """
+    for attempt in range(attempts):
+        try:
+            return await create(**kwargs)
+        except Exception as e:
+            if attempt == attempts - 1 or not _is_rate_limit(e):
+                raise
+            delay = min(30, 0.5 * (2 ** attempt))
+            print(f"⏳ Groq rate-limited, retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+
+class GroqBatcher:
+    """
+    Coalesces independent short LLM tasks that arrive within a small window
+    into a single chat completion (DataLoader pattern). Each caller awaits
+    its own future and gets back just its parsed JSON answer, so bursts of
+    concurrent requests pay one network round-trip instead of N.
+    """
+
+    def __init__(self, client, model: str, system: str,
+                 window: float = 0.01, max_batch: int = 32,
+                 max_tokens: int = 400, temperature: float = 0.7):
+        self.client = client
+        self.model = model
+        self.system = system
+        self.window = window
+        self.max_batch = max_batch
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+        # Truncated replies (finish_reason "length") auto-raise the budget
+        # 50% at a time, capped at 4x the starting value - a tight cap that
+        # keeps clipping JSON would otherwise silently degrade every call
+        self._max_tokens_cap = max_tokens * 4
+
+        self._pending: List[Tuple[str, str, asyncio.Future]] = []
+        self._counter = 0
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def ask(self, prompt: str) -> Any:
+        """
+        Queue a JSON-answering prompt. Resolves to the parsed JSON answer
+        once the current batch is flushed (at most `window` seconds later).
+        """
+        self._counter += 1
+        key = f"q{self._counter}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((key, prompt, future))
+
+        if len(self._pending) >= self.max_batch:
+            await self._flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+        return await future
+
+    def _note_finish(self, finish_reason) -> None:
+        """Raise the token budget if the last reply was cut off mid-JSON"""
+        if finish_reason == "length" and self.max_tokens < self._max_tokens_cap:
+            self.max_tokens = min(self._max_tokens_cap, int(self.max_tokens * 1.5))
+            print(f"📏 Batched reply truncated - raising max_tokens to {self.max_tokens}")
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.window)
+        await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        try:
+            if len(batch) == 1:
+                key, prompt, _ = batch[0]
+                answers = {key: await self._complete(prompt)}
+            else:
+                print(f"📦 Coalescing {len(batch)} LLM tasks into one call")
+                answers = await self._complete_many(batch)
+
+            # The batched reply can drop a task key (small models mangle
+            # arbitrary keys like "q37") - rerun those prompts individually
+            # instead of silently resolving their futures to None
+            missing = [(key, prompt, future) for key, prompt, future in batch
+                       if answers.get(key) is None]
+            if missing:
+                print(f"🔁 Batched reply missed {len(missing)} task(s), retrying individually")
+                retries = await asyncio.gather(
+                    *(self._complete(prompt) for _, prompt, _ in missing),
+                    return_exceptions=True
+                )
+                for (key, _, _), result in zip(missing, retries):
+                    answers[key] = result
+
+            for key, _, future in batch:
+                if not future.done():
+                    result = answers.get(key)
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _complete(self, prompt: str) -> Any:
+        """Single-task completion with one retry on invalid JSON"""
+        messages = [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": prompt}
+        ]
+
+        response = await completion_with_backoff(
+            self.client.chat.completions.create,
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            response_format={"type": "json_object"}
+        )
+        self._note_finish(response.choices[0].finish_reason)
+        result = response.choices[0].message.content.strip()
+
+        try:
+            return orjson.loads(result)
+        except orjson.JSONDecodeError as je:
+            # One retry with the parser error inlined so the model can fix
+            # itself - and if the reply was truncated, _note_finish already
+            # raised self.max_tokens, so the retry gets the bigger budget
+            messages.append({"role": "assistant", "content": result})
+            messages.append({"role": "user", "content": f"That JSON was invalid ({je}). Return the corrected JSON only."})
+            response = await completion_with_backoff(
+                self.client.chat.completions.create,
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                response_format={"type": "json_object"}
+            )
+            self._note_finish(response.choices[0].finish_reason)
+            return orjson.loads(response.choices[0].message.content.strip())
+
+    async def _complete_many(self, batch: List[Tuple[str, str, asyncio.Future]]) -> Dict[str, Any]:
+        """Answer a whole batch in one call, demultiplexed by task key"""
+        numbered = "\n\n".join(f"### Task {key}\n{prompt}" for key, prompt, _ in batch)
+        combined = (
+            "Answer each of the following independent tasks. "
+            "Return one JSON object mapping each task key to its JSON answer.\n\n"
+            + numbered
+        )
+
+        try:
+            response = await completion_with_backoff(
+                self.client.chat.completions.create,
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self.system},
+                    {"role": "user", "content": combined}
+                ],
+                temperature=self.temperature,
+                max_tokens=min(self.max_tokens * len(batch), 8000),
+                response_format={"type": "json_object"}
+            )
+            self._note_finish(response.choices[0].finish_reason)
+            return orjson.loads(response.choices[0].message.content.strip())
+        except Exception:
+            # Batch answer was unusable - fall back to per-task calls in parallel
+            results = await asyncio.gather(
+                *(self._complete(prompt) for _, prompt, _ in batch),
+                return_exceptions=True
+            )
+            answers = {}
+            for (key, _, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    raise result
+                answers[key] = result
+            return answers
@@ -1,9 +1,15 @@
-import requests
+import asyncio
+import httpx
+import orjson
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import random
+import time
 from typing import List, Dict
 
+# Global cap on concurrent scrape fanout so we don't hammer NSE
+_fetch_sem = asyncio.Semaphore(8)
+
 class DateScraperAgent:
     """
     Scrapes upcoming quarterly result dates from NSE/BSE
@@ -16,7 +22,15 @@ class DateScraperAgent:
             'Accept': 'application/json',
             'Accept-Language': 'en-US,en;q=0.9',
         }
-        
+
+        # One long-lived async client: reuses the TCP/TLS connection across
+        # calls and doesn't block the event loop while NSE timeouts tick
+        self.client = httpx.AsyncClient(headers=self.headers, timeout=10)
+
+        # NSE cookies are primed lazily and kept for a while
+        self._cookies_primed_at = 0.0
+        self._cookie_ttl = 600  # seconds
+
         # Popular companies for demo
         self.demo_companies = [
             {"symbol": "TCS", "name": "Tata Consultancy Services"},
@@ -63,24 +77,27 @@ class DateScraperAgent:
         Attempt to fetch real data from NSE
         Note: NSE blocks simple requests, needs session handling
         """
-        session = requests.Session()
-        
-        # First, get cookies by visiting homepage
-        session.get("https://www.nseindia.com", headers=self.headers, timeout=5)
-        
-        # Then fetch corporate actions
-        response = session.get(
-            self.nse_url,
-            headers=self.headers,
-            params={"index": "equities"},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            results = []
-            
-            for item in data:
+        async with _fetch_sem:
+            # Prime cookies by visiting the homepage, but only once per TTL -
+            # repeat calls skip the extra round-trip
+            if time.time() - self._cookies_primed_at > self._cookie_ttl:
+                await self.client.get("https://www.nseindia.com", timeout=5)
+                self._cookies_primed_at = time.time()
+
+            # Fan out over the segments we care about in one gather
+            param_sets = [{"index": "equities"}]
+            responses = await asyncio.gather(
+                *(self._get_with_backoff(self.nse_url, params=params) for params in param_sets)
+            )
+
+        results = []
+        for response in responses:
+            if response.status_code != 200:
+                continue
+
+            # orjson is a few times faster than the stdlib decoder behind
+            # httpx's response.json()
+            for item in orjson.loads(response.content):
                 if "result" in item.get("subject", "").lower():
                     results.append({
                         "company_symbol": item.get("symbol"),
@@ -89,41 +106,58 @@ class DateScraperAgent:
                         "quarter": self._determine_quarter(item.get("exDate")),
                         "financial_year": self._determine_fy(item.get("exDate"))
                     })
-            
-            return results
-        
-        return []
+
+        return results
+
+    async def _get_with_backoff(self, url: str, **kwargs) -> httpx.Response:
+        """GET with exponential backoff on NSE throttling (429/503)"""
+        response = None
+        for attempt in range(3):
+            response = await self.client.get(url, **kwargs)
+            if response.status_code not in (429, 503):
+                break
+            await asyncio.sleep(0.5 * (2 ** attempt))
+        return response
+
+    async def close(self):
+        """Release the shared HTTP client (call on app shutdown)"""
+        await self.client.aclose()
     
     def _generate_demo_dates(self, limit: int) -> List[Dict]:
         """
         Generate realistic upcoming result dates for demo
         """
-        results = []
+        companies = self.demo_companies[:limit]
         base_date = datetime.now()
-        
+
         quarters = ["Q1", "Q2", "Q3", "Q4"]
         current_quarter = (base_date.month - 1) // 3
-        
-        for i, company in enumerate(self.demo_companies[:limit]):
-            # Spread dates over next 30 days
-            days_ahead = random.randint(1, 30)
+
+        # One bulk draw over the next 30 days instead of a randint per company
+        offsets = random.choices(range(1, 31), k=len(companies))
+
+        # strftime once per distinct offset, not once per company
+        date_strs = {}
+        fin_years = {}
+        for days_ahead in set(offsets):
             result_date = base_date + timedelta(days=days_ahead)
-            
-            # Rotate quarters
-            quarter = quarters[(current_quarter + (i % 4)) % 4]
-            
-            results.append({
-                "company_symbol": company["symbol"],
-                "company_name": company["name"],
-                "result_date": result_date.strftime("%Y-%m-%d"),
-                "quarter": quarter,
-                "financial_year": f"FY{result_date.year % 100}"
-            })
-        
-        # Sort by date
-        results.sort(key=lambda x: x["result_date"])
-        
-        return results
+            date_strs[days_ahead] = result_date.strftime("%Y-%m-%d")
+            fin_years[days_ahead] = f"FY{result_date.year % 100}"
+
+        # Sort the day offsets (ints) up front - cheaper than sorting the
+        # assembled dicts by date string afterwards
+        order = sorted(range(len(companies)), key=offsets.__getitem__)
+
+        return [
+            {
+                "company_symbol": companies[i]["symbol"],
+                "company_name": companies[i]["name"],
+                "result_date": date_strs[offsets[i]],
+                "quarter": quarters[(current_quarter + (i % 4)) % 4],
+                "financial_year": fin_years[offsets[i]]
+            }
+            for i in order
+        ]
     
     def _determine_quarter(self, date_str: str) -> str:
         """Determine quarter from date"""
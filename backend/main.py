@@ -1,8 +1,21 @@
-from fastapi import FastAPI, HTTPException
+try:
+    # Faster event loop for the whole async stack (HTTP fetches, Groq
+    # calls, file I/O). Safe no-op on platforms without uvloop.
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict
+import asyncio
+import uuid
 import uvicorn
+from cachetools import TTLCache
+from collections import deque
 from datetime import datetime
 
 
@@ -14,10 +27,12 @@ from agents.analyzer_agent import AnalyzerAgent
 
 app = FastAPI(title="Market Khabri API", version="1.0.0")
 
-# CORS middleware for React frontend
+# CORS middleware for React frontend. The origin must be pinned (not "*"):
+# browsers refuse credentialed CORS against a wildcard, and the session
+# cookie has to round-trip for chat memory to work.
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify your frontend URL
+    allow_origins=["http://localhost:3000"],  # CRA dev server; add your deployed URL here
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -25,8 +40,33 @@ app.add_middleware(
 
 # Initialize orchestrator
 orchestrator = AgentOrchestrator()
-# --- NEW: In-memory store for the current session's chat history ---
-chat_history: List[Dict] = []
+
+# --- Per-session chat histories, bounded so memory can't grow without limit ---
+CHAT_HISTORY_MAX_TURNS = 50
+CHAT_HISTORY_CHAR_BUDGET = 16_000  # roughly 4k tokens of history per session
+SESSION_IDLE_TTL = 3600  # sessions idle for an hour get evicted
+
+sessions: TTLCache = TTLCache(maxsize=1024, ttl=SESSION_IDLE_TTL)
+session_locks: TTLCache = TTLCache(maxsize=1024, ttl=SESSION_IDLE_TTL)
+
+def _session_id_from(request: Request) -> str:
+    """Session id comes from a cookie; first call mints one"""
+    return request.cookies.get("session_id") or uuid.uuid4().hex
+
+def _session_history(session_id: str) -> deque:
+    if session_id not in sessions:
+        sessions[session_id] = deque(maxlen=CHAT_HISTORY_MAX_TURNS)
+        session_locks[session_id] = asyncio.Lock()
+    else:
+        # Re-setting refreshes the idle TTL for an active session
+        sessions[session_id] = sessions[session_id]
+        session_locks[session_id] = session_locks[session_id]
+    return sessions[session_id]
+
+def _trim_history(history: deque):
+    """Drop oldest turns until the history fits the char budget"""
+    while len(history) > 1 and sum(len(m["content"]) for m in history) > CHAT_HISTORY_CHAR_BUDGET:
+        history.popleft()
 
 # Pydantic models
 class Company(BaseModel):
@@ -119,47 +159,121 @@ async def analyze_company(symbol: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-@app.get("/api/latest-results", response_model=List[AnalysisResult])
+@app.get("/api/latest-results")
 async def get_latest_results(limit: int = 10):
     """
-    Get recently analyzed company results
+    Get recently analyzed company results.
+
+    Returns an ORJSONResponse directly: the stored payloads were already
+    validated as AnalysisResult when they were produced, so re-running N
+    dicts through Pydantic + stdlib json on every dashboard refresh is
+    pure overhead.
     """
     try:
         results = await orchestrator.get_latest_analyzed_results(limit)
-        return results
+        return ORJSONResponse(results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching results: {str(e)}")
 
 @app.post("/api/chat/new")
-async def new_chat_session():
-    """Clears the chat history to start a new session."""
-    global chat_history
-    chat_history = []
-    print("✨ New chat session started. History cleared.")
+async def new_chat_session(request: Request, response: Response):
+    """Clears this session's chat history to start fresh."""
+    session_id = _session_id_from(request)
+    _session_history(session_id).clear()
+    response.set_cookie("session_id", session_id, httponly=True)
+    print(f"✨ New chat session started for {session_id[:8]}. History cleared.")
     return {"message": "New chat session started."}
 
 @app.post("/api/chat")
-@app.post("/api/chat")
-async def chat_with_ai(query: ChatQuery):
+async def chat_with_ai(query: ChatQuery, request: Request, response: Response):
     """
-    Conversational interface that maintains session history.
+    Conversational interface that maintains per-session history.
     """
-    global chat_history
-    try:
-        # Append user's new message to the history
-        chat_history.append({"role": "user", "content": query.question})
+    session_id = _session_id_from(request)
+    chat_history = _session_history(session_id)
+    response.set_cookie("session_id", session_id, httponly=True)
 
-        response_text = await orchestrator.handle_chat_query(chat_history)
+    async with session_locks[session_id]:
+        try:
+            # Append user's new message to the history
+            chat_history.append({"role": "user", "content": query.question})
+            _trim_history(chat_history)
 
-        # Append assistant's response to the history for memory
-        chat_history.append({"role": "assistant", "content": response_text})
-        
-        return {"response": response_text}
-    except Exception as e:
-        # If something fails, remove the last user message to allow a retry
-        if chat_history and chat_history[-1]["role"] == "user":
-            chat_history.pop()
-        raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
+            response_text = await orchestrator.handle_chat_query(list(chat_history))
+
+            # Append assistant's response to the history for memory
+            chat_history.append({"role": "assistant", "content": response_text})
+
+            return {"response": response_text}
+        except Exception as e:
+            # If something fails, remove the last user message to allow a retry
+            if chat_history and chat_history[-1]["role"] == "user":
+                chat_history.pop()
+            raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
+
+@app.post("/api/chat/stream")
+async def chat_with_ai_stream(query: ChatQuery, request: Request):
+    """
+    Streaming chat - tokens are forwarded to the client as Groq produces
+    them, so the first word shows up at TTFT instead of after the full
+    completion.
+    """
+    session_id = _session_id_from(request)
+    chat_history = _session_history(session_id)
+
+    async def token_stream():
+        async with session_locks[session_id]:
+            chat_history.append({"role": "user", "content": query.question})
+            _trim_history(chat_history)
+
+            parts = []
+            try:
+                async for token in orchestrator.handle_chat_query_stream(list(chat_history)):
+                    parts.append(token)
+                    yield token
+                # Keep session memory once the full response is known
+                chat_history.append({"role": "assistant", "content": "".join(parts)})
+            except Exception as e:
+                if chat_history and chat_history[-1]["role"] == "user":
+                    chat_history.pop()
+                yield f"Chat failed: {str(e)}"
+
+    streaming_response = StreamingResponse(token_stream(), media_type="text/plain")
+    streaming_response.set_cookie("session_id", session_id, httponly=True)
+    return streaming_response
+
+@app.on_event("startup")
+async def warmup():
+    """
+    Open the Groq TLS connections before the first real request pays the
+    handshake: one 1-token ping per client (parser and analyzer keep
+    separate pools).
+    """
+    async def ping(client, model):
+        try:
+            await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": "ping"}],
+                max_tokens=1
+            )
+        except Exception as e:
+            print(f"⚠️ Groq warmup skipped: {e}")
+
+    pings = []
+    if orchestrator.parser.client:
+        pings.append(ping(orchestrator.parser.client, orchestrator.parser.model))
+    if orchestrator.analyzer.client:
+        pings.append(ping(orchestrator.analyzer.client, orchestrator.analyzer.model))
+    if pings:
+        await asyncio.gather(*pings)
+        print("🔥 Groq connections warmed up")
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close the shared HTTP connection pools cleanly"""
+    await orchestrator.analyzer.close()
+    await orchestrator.fetcher.close()
+    await orchestrator.scraper.close()
 
 @app.get("/api/health")
 async def health_check():
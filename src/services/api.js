@@ -34,6 +34,10 @@ const api = {
       const response = await fetch(`${API_BASE_URL}/chat`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
+        // The backend tracks conversation memory via a session cookie -
+        // without credentials the browser drops it and every message
+        // starts a brand-new session.
+        credentials: 'include',
         body: JSON.stringify({ question })
       });
       if (!response.ok) throw new Error('Failed to send message');